@@ -8,14 +8,28 @@ Author: SkydioFlyer
 License: MIT
 """
 
-import os
+import asyncio
+import html as html_lib
 import json
 import logging
+import re
+import time
 from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from urllib import robotparser
-import requests
-from requests.adapters import HTTPAdapter, Retry
-from bs4 import BeautifulSoup
+import aiohttp
+from selectolax.lexbor import LexborHTMLParser as HTMLParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import brotli  # type: ignore[import-untyped]  # Lets aiohttp decode brotli-compressed responses
+except ImportError:
+    brotli = None
 
 # Configuration
 USER_AGENT = 'Mozilla/5.0 (compatible; AnansiScraper/1.0; +https://anansi.hackclub.com/)'
@@ -23,21 +37,85 @@ TRENDING_URL = 'https://github.com/trending'
 ROBOTS_URL = 'https://github.com/robots.txt'
 TIMEOUT = 10
 MAX_RETRIES = 3
+ROBOTS_TTL = 24 * 60 * 60  # Seconds before robots.txt is fetched again
+BACKOFF_FACTOR = 1
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+MAX_CONNECTIONS_PER_HOST = 64
+KEEPALIVE_TIMEOUT = 30
+ACCEPT_ENCODING = 'br, gzip, deflate' if brotli is not None else 'gzip, deflate'
+PRETTY_JSON = False  # Indent saved JSON for human readers
+FAST_PARSE = True  # Try the regex parser before building a DOM tree
+DATA_DIR = Path('data')
+HTTP_CACHE_PATH = DATA_DIR / '.http_cache.json'  # ETag/Last-Modified per URL
+
+# Fields extracted for each repository
+REPO_FIELDS = ('name', 'description', 'language', 'stars')
+Repo = Dict[str, Union[str, int]]
 
-# Setup logging
-logging.basicConfig(
-    filename='scraper.log',
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# CSS selectors for the trending page markup
+_SEL_ARTICLE = 'article.Box-row'
+_SEL_NAME = 'h2 a'
+_SEL_DESC = 'p'
+_SEL_LANG = 'span[itemprop="programmingLanguage"]'
+_SEL_STARS = 'a[href$="/stargazers"]'
 
+# Regex equivalents of the selectors above, used by the fast parser
+_RE_ARTICLE_OPEN = re.compile(r'<article\b[^>]*\bclass="[^"]*(?<![\w-])Box-row(?![\w-])[^"]*"')
+_RE_ARTICLE = re.compile(r'<article\b[^>]*\bclass="[^"]*(?<![\w-])Box-row(?![\w-])[^"]*"[^>]*>(.*?)</article>', re.S)
+_RE_H2 = re.compile(r'<h2\b[^>]*>(.*?)</h2>', re.S)
+_RE_NAME = re.compile(r'<a\b[^>]*?\shref="([^"]*)"')
+_RE_DESC = re.compile(r'<p\b[^>]*>(.*?)</p>', re.S)
+_RE_LANG = re.compile(r'<span\b[^>]*?\sitemprop="programmingLanguage"[^>]*>(.*?)</span>', re.S)
+_RE_STARS = re.compile(r'<a\b[^>]*?\shref="[^"]*/stargazers"[^>]*>(.*?)</a>', re.S)
+_RE_TAG = re.compile(r'<[^>]*>')
+_RE_OPAQUE = re.compile(r'<!--|<(?:script|style|template|textarea)\b', re.I)  # Content the regexes would misread
 
-def can_fetch(url, user_agent=USER_AGENT):
+# Parsed robots.txt, reused until it is older than ROBOTS_TTL
+_robot_parser = None
+
+
+async def _get_robot_parser(session):
+    """
+    Return a parsed robots.txt, fetching it only when the cached copy is stale.
+    
+    Args:
+        session (aiohttp.ClientSession): Session from create_async_session()
+        
+    Returns:
+        RobotFileParser: Parser loaded with GitHub's robots.txt rules
+        
+    Raises:
+        aiohttp.ClientError: If robots.txt cannot be fetched
+        asyncio.TimeoutError: If the last attempt times out
+    """
+    global _robot_parser
+    
+    if _robot_parser is not None and time.time() - _robot_parser.mtime() < ROBOTS_TTL:
+        return _robot_parser
+    
+    rp = robotparser.RobotFileParser(ROBOTS_URL)
+    status, _, body = await _get(session, ROBOTS_URL, accept=range(400, 500))
+    
+    # Mirror RobotFileParser.read(): auth errors forbid everything,
+    # other client errors mean there are no restrictions
+    if status in (401, 403):
+        rp.disallow_all = True
+    elif 400 <= status < 500:
+        rp.allow_all = True
+    else:
+        rp.parse(body.decode('utf-8', errors='replace').splitlines())
+    rp.modified()
+    
+    _robot_parser = rp
+    return rp
+
+
+async def can_fetch(session, url, user_agent=USER_AGENT):
     """
     Check if scraping is allowed by robots.txt.
     
     Args:
+        session (aiohttp.ClientSession): Session from create_async_session()
         url (str): The URL to check
         user_agent (str): User agent string
         
@@ -45,174 +123,486 @@ def can_fetch(url, user_agent=USER_AGENT):
         bool: True if scraping is allowed, False otherwise
     """
     try:
-        rp = robotparser.RobotFileParser()
-        rp.set_url(ROBOTS_URL)
-        rp.read()
-        return rp.can_fetch(user_agent, url)
+        return (await _get_robot_parser(session)).can_fetch(user_agent, url)
     except Exception as e:
         logging.warning(f"Could not check robots.txt: {e}")
         return True  # Default to allowing if robots.txt can't be read
 
 
-def fetch_trending():
+def _load_http_cache():
     """
-    Fetch the GitHub trending page HTML.
+    Load the stored HTTP validators for previously fetched URLs.
     
     Returns:
-        str: HTML content of the trending page
+        dict: Mapping of URL to {'etag': ..., 'last_modified': ...}
+    """
+    try:
+        return json.loads(HTTP_CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _conditional_headers(url):
+    """
+    Build conditional-GET headers from the validators stored for a URL.
+    
+    Args:
+        url (str): URL about to be requested
         
-    Raises:
-        requests.RequestException: If the request fails
-    """
-    headers = {'User-Agent': USER_AGENT}
-    session = requests.Session()
-    retries = Retry(
-        total=MAX_RETRIES,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504]
+    Returns:
+        dict: If-None-Match / If-Modified-Since headers, empty if none stored
+    """
+    entry = _load_http_cache().get(url, {})
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _store_validators(url, response_headers):
+    """
+    Persist the ETag and Last-Modified headers of a successful response.
+    
+    Args:
+        url (str): URL that was fetched
+        response_headers (Mapping): Headers of the 200 response
+    """
+    etag = response_headers.get('ETag')
+    last_modified = response_headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+    
+    cache = _load_http_cache()
+    cache[url] = {'etag': etag, 'last_modified': last_modified}
+    try:
+        HTTP_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        HTTP_CACHE_PATH.write_bytes(_dumps(cache))
+    except OSError as e:
+        logging.warning(f"Could not write HTTP cache {HTTP_CACHE_PATH}: {e}")
+
+
+def create_async_session():
+    """
+    Create an aiohttp session for fetching pages concurrently.
+    
+    Returns:
+        aiohttp.ClientSession: Session with keep-alive connection pooling
+    """
+    connector = aiohttp.TCPConnector(
+        limit_per_host=MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT
     )
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING},
+        timeout=aiohttp.ClientTimeout(total=TIMEOUT)
+    )
+
+
+async def _get(session, url, headers=None, accept=()):
+    """
+    GET a URL, retrying with exponential backoff on connection errors,
+    timeouts and the statuses in RETRY_STATUSES.
     
-    logging.info(f"Fetching trending page from {TRENDING_URL}")
-    response = session.get(TRENDING_URL, headers=headers, timeout=TIMEOUT)
-    response.raise_for_status()
+    Args:
+        session (aiohttp.ClientSession): Session from create_async_session()
+        url (str): URL to fetch
+        headers (dict): Extra request headers
+        accept (Container): Error statuses to return instead of raising
+        
+    Returns:
+        tuple: (status, headers, body) of the final response
+        
+    Raises:
+        aiohttp.ClientError: If the request fails after all retries
+        asyncio.TimeoutError: If the last attempt times out
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status in RETRY_STATUSES and not last_attempt:
+                    logging.warning(f"Got HTTP {response.status} from {url}, retrying")
+                else:
+                    if response.status not in accept:
+                        response.raise_for_status()
+                    return response.status, response.headers, await response.read()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            logging.warning(f"Error fetching {url}: {e}, retrying")
+        
+        await asyncio.sleep(BACKOFF_FACTOR * (2 ** attempt))
+
+
+async def fetch_trending_async(session, url=TRENDING_URL, conditional=False):
+    """
+    Fetch a GitHub trending page HTML asynchronously.
     
+    Args:
+        session (aiohttp.ClientSession): Session from create_async_session()
+        url (str): Trending page URL to fetch
+        conditional (bool): Send the stored ETag/Last-Modified validators
+            so an unchanged page comes back as 304 Not Modified
+        
+    Returns:
+        str: HTML content of the trending page, or None if unchanged
+        
+    Raises:
+        aiohttp.ClientError: If the request fails after all retries
+        asyncio.TimeoutError: If the last attempt times out
+    """
+    logging.info(f"Fetching trending page from {url}")
+    headers = _conditional_headers(url) if conditional else {}
+    status, response_headers, body = await _get(session, url, headers=headers)
+    
+    if status == 304:
+        logging.info(f"Trending page {url} not modified since last fetch")
+        return None
+    
+    _store_validators(url, response_headers)
     logging.info("Successfully fetched trending page")
-    return response.text
+    # GitHub always serves UTF-8; decoding directly skips charset detection
+    return body.decode('utf-8', errors='replace')
 
 
-def parse_trending(html):
+def _parse_stars(text: str) -> int:
     """
-    Parse the GitHub trending page HTML to extract repository information.
+    Convert a star count such as '12,345' to an int.
+    
+    Args:
+        text (str): Stripped text of the stargazers link
+        
+    Returns:
+        int: Star count, or 0 if the text is not a number
+    """
+    try:
+        return int(text.replace(',', ''))
+    except ValueError:
+        logging.debug(f"Could not parse star count {text!r}")
+        return 0
+
+
+def _text(fragment: str) -> str:
+    """
+    Return the text content of an HTML fragment, like a node's .text().
+    
+    Args:
+        fragment (str): Raw HTML matched by one of the _RE_* patterns
+        
+    Returns:
+        str: Fragment with tags removed and entities decoded, stripped
+    """
+    return html_lib.unescape(_RE_TAG.sub('', fragment)).strip()
+
+
+def _match_trending_regex(html: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    Check that the trending page fits the fast parser's regexes.
+    
+    The check is all-or-nothing so the two parsers never mix on one page.
     
     Args:
         html (str): HTML content of the trending page
         
     Returns:
-        list: List of dictionaries containing repository information
+        list: (article HTML, repository href) per row, or None if no rows
+            were found or any row did not match the expected markup
+    """
+    articles = _RE_ARTICLE.findall(html)
+    if not articles or len(articles) != len(_RE_ARTICLE_OPEN.findall(html)):
+        return None  # No rows, or an unclosed row swallowed or dropped a neighbour
+    
+    rows = []
+    for article in articles:
+        if _RE_OPAQUE.search(article):
+            return None
+        h2_match = _RE_H2.search(article)
+        name_match = _RE_NAME.search(h2_match.group(1)) if h2_match else None
+        if not name_match:
+            return None
+        rows.append((article, name_match.group(1)))
+    
+    logging.info(f"Found {len(articles)} repositories on trending page")
+    return rows
+
+
+def _iter_trending_regex(rows: List[Tuple[str, str]]) -> Iterator[Repo]:
     """
-    soup = BeautifulSoup(html, 'html.parser')
-    repo_list = []
+    Extract repositories from rows accepted by _match_trending_regex().
     
-    repositories = soup.select('article.Box-row')
+    Args:
+        rows (list): (article HTML, repository href) pairs
+        
+    Yields:
+        dict: Repository information, with the star count parsed as an int
+    """
+    for article, href in rows:
+        name = html_lib.unescape(href).strip('/')
+        
+        desc_match = _RE_DESC.search(article)
+        desc = _text(desc_match.group(1)) if desc_match else ''
+        
+        lang_match = _RE_LANG.search(article)
+        lang = _text(lang_match.group(1)) if lang_match else ''
+        
+        stars_match = _RE_STARS.search(article)
+        stars = _parse_stars(_text(stars_match.group(1))) if stars_match else 0
+        
+        if name:
+            yield {
+                'name': name,
+                'description': desc,
+                'language': lang,
+                'stars': stars
+            }
+
+
+def _iter_trending_tree(html: str) -> Iterator[Repo]:
+    """
+    Parse the trending page with selectolax, yielding one repository at a time.
+    
+    Args:
+        html (str): HTML content of the trending page
+        
+    Yields:
+        dict: Repository information, with the star count parsed as an int
+    """
+    tree = HTMLParser(html)
+    
+    repositories = tree.css(_SEL_ARTICLE)
     logging.info(f"Found {len(repositories)} repositories on trending page")
     
     for repo in repositories:
-        try:
-            # Extract repository name
-            name_element = repo.h2.a
-            name = name_element.get('href', '').strip('/') if name_element else ''
-            
-            # Extract description
-            desc_element = repo.p
-            desc = desc_element.text.strip() if desc_element else ''
-            
-            # Extract programming language
-            lang_element = repo.find('span', itemprop='programmingLanguage')
-            lang = lang_element.text.strip() if lang_element else ''
-            
-            # Extract star count
-            stars_element = repo.find('a', href=lambda x: x and x.endswith('/stargazers'))
-            stars = stars_element.text.strip().replace(',', '') if stars_element else '0'
-            
-            if name:  # Only add if we have a valid repository name
-                repo_list.append({
-                    'name': name,
-                    'description': desc,
-                    'language': lang,
-                    'stars': stars
-                })
-                
-        except Exception as e:
-            logging.warning(f"Error parsing repository: {e}")
-            continue
+        # Extract repository name (a bare href attribute has the value None)
+        name_element = repo.css_first(_SEL_NAME)
+        name = (name_element.attributes.get('href') or '').strip('/') if name_element else ''
+        
+        # Extract description
+        desc_element = repo.css_first(_SEL_DESC)
+        desc = desc_element.text().strip() if desc_element else ''
+        
+        # Extract programming language
+        lang_element = repo.css_first(_SEL_LANG)
+        lang = lang_element.text().strip() if lang_element else ''
+        
+        # Extract star count
+        stars_element = repo.css_first(_SEL_STARS)
+        stars = _parse_stars(stars_element.text().strip()) if stars_element else 0
+        
+        if name:  # Only yield if we have a valid repository name
+            yield {
+                'name': name,
+                'description': desc,
+                'language': lang,
+                'stars': stars
+            }
+
+
+def iter_trending(html: str) -> Iterator[Repo]:
+    """
+    Parse the GitHub trending page HTML, yielding one repository at a time.
+    
+    When FAST_PARSE is set the regex parser is tried first; the selectolax
+    parser is used if the page does not match the expected markup.
+    
+    Args:
+        html (str): HTML content of the trending page
+        
+    Yields:
+        dict: Repository information, with the star count parsed as an int
+    """
+    rows = _match_trending_regex(html) if FAST_PARSE else None
+    if rows is not None:
+        yield from _iter_trending_regex(rows)
+    else:
+        yield from _iter_trending_tree(html)
+
+
+def parse_trending(html: str) -> List[Repo]:
+    """
+    Parse the GitHub trending page HTML to extract repository information.
     
+    Args:
+        html (str): HTML content of the trending page
+        
+    Returns:
+        list: List of dictionaries containing repository information,
+            with the star count parsed as an int
+    """
+    repo_list: List[Repo] = list(iter_trending(html))
     logging.info(f"Successfully parsed {len(repo_list)} repositories")
     return repo_list
 
 
-def save_data(data):
+def _dumps(data):
+    """
+    Serialize data to UTF-8 encoded JSON, using orjson when it is installed.
+    
+    Args:
+        data: JSON-serializable object
+        
+    Returns:
+        bytes: Encoded JSON document
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if PRETTY_JSON else 0)
+    indent = 2 if PRETTY_JSON else None
+    separators = None if PRETTY_JSON else (',', ':')
+    return json.dumps(data, ensure_ascii=False, indent=indent, separators=separators).encode('utf-8')
+
+
+def parse_trending_columnar(html: str) -> Dict[str, List[Union[str, int]]]:
+    """
+    Parse the GitHub trending page HTML into parallel columns.
+    
+    The lists share one index per repository, so they can be handed
+    straight to columnar tools such as pyarrow.table() or numpy.
+    
+    Args:
+        html (str): HTML content of the trending page
+        
+    Returns:
+        dict: Mapping of 'name', 'description', 'language' and 'stars'
+            to lists of values in page order
+    """
+    columns: Dict[str, List[Union[str, int]]] = {key: [] for key in REPO_FIELDS}
+    for repo in iter_trending(html):
+        for key in REPO_FIELDS:
+            columns[key].append(repo[key])
+    return columns
+
+
+def _today():
+    """
+    Return today's UTC date as used for data folder names.
+    
+    Returns:
+        str: Date formatted as YYYY-MM-DD
+    """
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _data_path(date_str):
+    """
+    Return the path of the trending data file for a date.
+    
+    Args:
+        date_str (str): Date folder name (YYYY-MM-DD)
+        
+    Returns:
+        Path: Location of that day's trending.json
+    """
+    return DATA_DIR / date_str / 'trending.json'
+
+
+def save_data(data, date_str=None, overwrite=False):
     """
     Save repository data to a JSON file organized by date.
     
     Args:
         data (list): List of repository dictionaries
+        date_str (str): Date folder name (YYYY-MM-DD), defaults to today in UTC
+        overwrite (bool): Replace the file if it already exists
         
     Returns:
         bool: True if data was saved, False if file already exists
     """
-    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-    dir_path = os.path.join('data', today)
-    os.makedirs(dir_path, exist_ok=True)
-    file_path = os.path.join(dir_path, 'trending.json')
+    file_path = _data_path(date_str or _today())
+    file_path.parent.mkdir(parents=True, exist_ok=True)
     
-    if os.path.exists(file_path):
+    if file_path.exists() and not overwrite:
         logging.info(f"File {file_path} already exists. Skipping save.")
-        print(f"File {file_path} already exists. Skipping save.")
         return False
     
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with file_path.open('wb') as f:
+            f.write(_dumps(data))
         
         logging.info(f'Successfully saved {len(data)} repositories to {file_path}')
-        print(f'Successfully saved {len(data)} repositories to {file_path}')
         return True
         
     except Exception as e:
         logging.error(f"Error saving data to {file_path}: {e}")
-        print(f"Error saving data: {e}")
         return False
 
 
-def main():
+async def main_async():
     """
-    Main function to orchestrate the scraping process.
+    Main coroutine to orchestrate the scraping process.
     """
     logging.info("Starting GitHub trending scraper")
-    print("Starting GitHub trending scraper...")
+    today = _today()
     
     try:
-        # Check robots.txt compliance
-        if not can_fetch(TRENDING_URL):
-            logging.warning('Scraping not allowed by robots.txt')
-            print('❌ Scraping not allowed by robots.txt')
+        # Once today's snapshot exists, only refetch if the server can tell
+        # us whether the page changed; a changed page replaces the snapshot
+        snapshot_exists = _data_path(today).exists()
+        if snapshot_exists and not _conditional_headers(TRENDING_URL):
+            logging.info("ℹ️  Data already exists for today.")
             return
         
-        logging.info("Robots.txt check passed")
-        print("✅ Robots.txt check passed")
+        async with create_async_session() as session:
+            # Check robots.txt compliance
+            if not await can_fetch(session, TRENDING_URL):
+                logging.warning('❌ Scraping not allowed by robots.txt')
+                return
+            
+            logging.info("✅ Robots.txt check passed")
+            
+            # Fetch and parse trending page
+            html = await fetch_trending_async(session, TRENDING_URL, conditional=snapshot_exists)
+        
+        if html is None:
+            return  # Not modified; fetch_trending_async() already logged it
         
-        # Fetch and parse trending page
-        html = fetch_trending()
         trending_repos = parse_trending(html)
         
         if not trending_repos:
-            logging.warning("No repositories found on trending page")
-            print("⚠️  No repositories found on trending page")
+            logging.warning("⚠️  No repositories found on trending page")
             return
         
         # Save data
-        saved = save_data(trending_repos)
+        saved = save_data(trending_repos, date_str=today, overwrite=snapshot_exists)
         
         if saved:
-            print(f'✅ Successfully scraped {len(trending_repos)} repositories.')
-            logging.info(f"Scraping completed successfully. Found {len(trending_repos)} repositories.")
+            logging.info(f"✅ Scraping completed successfully. Found {len(trending_repos)} repositories.")
         else:
-            print("ℹ️  Data already exists for today.")
+            logging.info("ℹ️  Data already exists for today.")
             
-    except requests.RequestException as e:
-        error_msg = f'Network error: {e}'
-        logging.error(error_msg)
-        print(f'❌ {error_msg}')
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f'❌ Network error: {e}')
         
     except Exception as e:
-        error_msg = f'Unexpected error: {e}'
-        logging.error(error_msg)
-        print(f'❌ {error_msg}')
+        logging.error(f'❌ Unexpected error: {e}')
     
     finally:
         logging.info("Scraper finished")
-        print("Scraper finished.")
+
+
+def setup_logging():
+    """
+    Send log messages to scraper.log and the console.
+    
+    Called from main() rather than at import time, so importing the module
+    (e.g. from the tests) leaves the caller's logging setup alone.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s: %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[logging.FileHandler('scraper.log'), logging.StreamHandler()]
+    )
+
+
+def main():
+    """
+    Run the scraper on a fresh event loop.
+    """
+    setup_logging()
+    asyncio.run(main_async())
 
 
 if __name__ == '__main__':
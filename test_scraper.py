@@ -4,8 +4,15 @@ Unit tests for the GitHub Trending Scraper.
 Tests the HTML parsing functionality to ensure correct data extraction.
 """
 
+import asyncio
+import json
+import tempfile
 import unittest
-from scraper import parse_trending
+from collections.abc import Iterator
+from pathlib import Path
+from unittest import mock
+import scraper
+from scraper import iter_trending, parse_trending, parse_trending_columnar
 
 # Sample HTML matching GitHub's trending page structure
 SAMPLE_HTML = '''
@@ -34,9 +41,14 @@ SAMPLE_HTML = '''
 class TestParseTrending(unittest.TestCase):
     """Test cases for the parse_trending function."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Parse the sample page once for all read-only assertions."""
+        cls.basic_repos = parse_trending(SAMPLE_HTML)
+    
     def test_parse_trending_basic(self):
         """Test basic parsing functionality."""
-        repos = parse_trending(SAMPLE_HTML)
+        repos = self.basic_repos
         
         # Should find 3 repositories
         self.assertEqual(len(repos), 3)
@@ -45,19 +57,19 @@ class TestParseTrending(unittest.TestCase):
         self.assertEqual(repos[0]['name'], 'torvalds/linux')
         self.assertEqual(repos[0]['description'], 'Linux kernel source tree')
         self.assertEqual(repos[0]['language'], 'C')
-        self.assertEqual(repos[0]['stars'], '160000')  # Commas should be removed
+        self.assertEqual(repos[0]['stars'], 160000)  # Commas should be removed
         
         # Test second repository
         self.assertEqual(repos[1]['name'], 'microsoft/vscode')
         self.assertEqual(repos[1]['description'], 'Visual Studio Code')
         self.assertEqual(repos[1]['language'], 'TypeScript')
-        self.assertEqual(repos[1]['stars'], '120000')
+        self.assertEqual(repos[1]['stars'], 120000)
         
         # Test third repository (no language)
         self.assertEqual(repos[2]['name'], 'example/no-language')
         self.assertEqual(repos[2]['description'], 'Repository with no language specified')
         self.assertEqual(repos[2]['language'], '')  # Should be empty string
-        self.assertEqual(repos[2]['stars'], '1234')
+        self.assertEqual(repos[2]['stars'], 1234)
     
     def test_parse_trending_empty_html(self):
         """Test parsing with empty HTML."""
@@ -81,7 +93,251 @@ class TestParseTrending(unittest.TestCase):
         self.assertEqual(repos[0]['name'], 'incomplete/repo')
         self.assertEqual(repos[0]['description'], '')
         self.assertEqual(repos[0]['language'], '')
-        self.assertEqual(repos[0]['stars'], '0')
+        self.assertEqual(repos[0]['stars'], 0)
+    
+    def test_parse_trending_unparseable_stars(self):
+        """Test that a non-numeric star count is stored as 0."""
+        html = '''
+        <article class="Box-row">
+          <h2><a href="/odd/stars">odd/stars</a></h2>
+          <a href="/odd/stars/stargazers">1.2k</a>
+        </article>
+        '''
+        repos = parse_trending(html)
+        
+        self.assertEqual(len(repos), 1)
+        self.assertEqual(repos[0]['name'], 'odd/stars')
+        self.assertEqual(repos[0]['stars'], 0)
+
+
+class TestIterTrending(unittest.TestCase):
+    """Test cases for the iter_trending generator."""
+    
+    def test_iter_trending_is_lazy(self):
+        """Test that both parsers extract one repository per item consumed."""
+        # The second row's star count is logged when (and only when) it is parsed
+        html = SAMPLE_HTML.replace('120,000', 'lots')
+        for fast_parse in (True, False):
+            with self.subTest(fast_parse=fast_parse), \
+                    mock.patch('scraper.FAST_PARSE', fast_parse), \
+                    self.assertLogs(level='DEBUG') as logs:
+                repos = iter_trending(html)
+                self.assertIsInstance(repos, Iterator)
+                self.assertEqual(next(repos)['name'], 'torvalds/linux')
+                self.assertFalse(any('star count' in line for line in logs.output))
+                self.assertEqual(next(repos)['stars'], 0)
+                self.assertTrue(any('star count' in line for line in logs.output))
+    
+    def test_iter_trending_matches_parse_trending(self):
+        """Test that the generator yields the same records as parse_trending."""
+        self.assertEqual(list(iter_trending(SAMPLE_HTML)), parse_trending(SAMPLE_HTML))
+    
+    def test_iter_trending_fast_path_matches_tree_parser(self):
+        """Test that the regex fast path and the selectolax parser agree."""
+        fast = list(iter_trending(SAMPLE_HTML))
+        with mock.patch('scraper.FAST_PARSE', False):
+            tree = list(iter_trending(SAMPLE_HTML))
+        self.assertEqual(fast, tree)
+    
+    def test_iter_trending_falls_back_on_unexpected_markup(self):
+        """Test that markup the regexes do not recognise is still parsed."""
+        html = '''
+        <article class="Box-row">
+          <h2><a href='/single/quoted'>single/quoted</a></h2>
+          <p>Description &amp; more</p>
+        </article>
+        '''
+        repos = list(iter_trending(html))
+        self.assertEqual(len(repos), 1)
+        self.assertEqual(repos[0]['name'], 'single/quoted')
+        self.assertEqual(repos[0]['description'], 'Description & more')
+    
+    def _assert_parsers_agree(self, html):
+        """Assert the fast path and the selectolax parser give the same rows."""
+        fast = list(iter_trending(html))
+        with mock.patch('scraper.FAST_PARSE', False):
+            tree = list(iter_trending(html))
+        self.assertEqual(fast, tree)
+        return fast
+    
+    def test_iter_trending_unclosed_last_row(self):
+        """Test that a truncated final row is not dropped by the fast path."""
+        html = SAMPLE_HTML.replace('</article>\n</body></html>', '\n</body></html>')
+        repos = self._assert_parsers_agree(html)
+        self.assertEqual(len(repos), 3)
+        self.assertEqual(repos[2]['name'], 'example/no-language')
+    
+    def test_iter_trending_ignores_script_content(self):
+        """Test that markup inside a script is not read as a description."""
+        html = '''
+        <article class="Box-row">
+          <h2><a href="/with/script">with/script</a></h2>
+          <script>document.write("<p>not a description</p>")</script>
+          <a href="/with/script/stargazers">42</a>
+        </article>
+        '''
+        repos = self._assert_parsers_agree(html)
+        self.assertEqual(repos[0]['description'], '')
+
+
+class TestParseTrendingColumnar(unittest.TestCase):
+    """Test cases for the parse_trending_columnar function."""
+    
+    def test_parse_trending_columnar_basic(self):
+        """Test that columns line up with the row-based output."""
+        columns = parse_trending_columnar(SAMPLE_HTML)
+        
+        self.assertEqual(columns['name'], ['torvalds/linux', 'microsoft/vscode', 'example/no-language'])
+        self.assertEqual(columns['language'], ['C', 'TypeScript', ''])
+        self.assertEqual(columns['stars'], [160000, 120000, 1234])
+        self.assertEqual(len(columns['description']), 3)
+    
+    def test_parse_trending_columnar_empty_html(self):
+        """Test that empty HTML gives empty columns."""
+        columns = parse_trending_columnar('<html><body></body></html>')
+        self.assertEqual(columns, {'name': [], 'description': [], 'language': [], 'stars': []})
+
+
+class _StubResponse:
+    """Minimal stand-in for an aiohttp response context manager."""
+    
+    def __init__(self, status, headers=None, body=b''):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def read(self):
+        return self.body
+    
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise AssertionError(f"Unexpected HTTP {self.status}")
+
+
+class _StubSession:
+    """Records request headers and always returns the same response."""
+    
+    def __init__(self, response):
+        self.response = response
+        self.sent_headers = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    def get(self, url, headers=None):
+        self.sent_headers.append(headers)
+        return self.response
+
+
+class TestConditionalGet(unittest.TestCase):
+    """Test cases for ETag/Last-Modified revalidation."""
+    
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch('scraper.HTTP_CACHE_PATH', Path(tmp.name, '.http_cache.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_store_validators_round_trip(self):
+        """Test that stored validators become conditional request headers."""
+        scraper._store_validators('https://example.com/', {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'})
+        
+        self.assertEqual(scraper._conditional_headers('https://example.com/'), {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'
+        })
+        self.assertEqual(scraper._conditional_headers('https://example.com/other'), {})
+    
+    def test_store_validators_without_validators(self):
+        """Test that responses without ETag or Last-Modified are not cached."""
+        scraper._store_validators('https://example.com/', {})
+        
+        self.assertFalse(scraper.HTTP_CACHE_PATH.exists())
+        self.assertEqual(scraper._conditional_headers('https://example.com/'), {})
+    
+    def test_fetch_trending_not_modified(self):
+        """Test that a 304 response sends the validators and returns None."""
+        scraper._store_validators(scraper.TRENDING_URL, {'ETag': '"v1"'})
+        session = _StubSession(_StubResponse(304))
+        
+        html = asyncio.run(scraper.fetch_trending_async(session, conditional=True))
+        
+        self.assertIsNone(html)
+        self.assertEqual(session.sent_headers, [{'If-None-Match': '"v1"'}])
+    
+    def test_fetch_trending_stores_new_validators(self):
+        """Test that a 200 response returns the page and updates the cache."""
+        session = _StubSession(_StubResponse(200, {'ETag': '"v2"'}, SAMPLE_HTML.encode('utf-8')))
+        
+        html = asyncio.run(scraper.fetch_trending_async(session))
+        
+        self.assertEqual(html, SAMPLE_HTML)
+        self.assertEqual(session.sent_headers, [{}])
+        self.assertEqual(scraper._conditional_headers(scraper.TRENDING_URL), {'If-None-Match': '"v2"'})
+
+
+class TestMainAsync(unittest.TestCase):
+    """Test how main_async() treats an existing snapshot for today."""
+    
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.data_dir = Path(tmp.name, 'data')
+        for patcher in (
+            mock.patch('scraper.DATA_DIR', self.data_dir),
+            mock.patch('scraper.HTTP_CACHE_PATH', self.data_dir / '.http_cache.json'),
+            mock.patch('scraper._today', return_value='2025-01-01'),
+            mock.patch('scraper.can_fetch', mock.AsyncMock(return_value=True)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.snapshot = self.data_dir / '2025-01-01' / 'trending.json'
+        self.snapshot.parent.mkdir(parents=True)
+        self.snapshot.write_bytes(b'[]')
+    
+    def _run(self, session):
+        with mock.patch('scraper.create_async_session', return_value=session) as create:
+            asyncio.run(scraper.main_async())
+        return create
+    
+    def test_snapshot_without_validators_skips_fetch(self):
+        """Test that no session is created when there is nothing to revalidate."""
+        create = self._run(_StubSession(_StubResponse(200, body=SAMPLE_HTML.encode('utf-8'))))
+        
+        create.assert_not_called()
+        self.assertEqual(self.snapshot.read_bytes(), b'[]')
+    
+    def test_snapshot_not_modified_is_kept(self):
+        """Test that a 304 leaves today's snapshot untouched."""
+        scraper._store_validators(scraper.TRENDING_URL, {'ETag': '"v1"'})
+        session = _StubSession(_StubResponse(304))
+        
+        self._run(session)
+        
+        self.assertEqual(session.sent_headers, [{'If-None-Match': '"v1"'}])
+        self.assertEqual(self.snapshot.read_bytes(), b'[]')
+    
+    def test_snapshot_replaced_when_page_changed(self):
+        """Test that a 200 overwrites today's snapshot with the new page."""
+        scraper._store_validators(scraper.TRENDING_URL, {'ETag': '"v1"'})
+        session = _StubSession(_StubResponse(200, {'ETag': '"v2"'}, SAMPLE_HTML.encode('utf-8')))
+        
+        self._run(session)
+        
+        self.assertEqual(session.sent_headers, [{'If-None-Match': '"v1"'}])
+        self.assertEqual(json.loads(self.snapshot.read_bytes()), parse_trending(SAMPLE_HTML))
+        self.assertEqual(scraper._conditional_headers(scraper.TRENDING_URL), {'If-None-Match': '"v2"'})
 
 
 if __name__ == '__main__':